@@ -0,0 +1,201 @@
+# activity_util.py
+import time
+from collections import OrderedDict
+
+BUCKET_SECONDS = 60         # Breite eines Zeit-Buckets (1 Minute)
+WINDOW_BUCKETS = 60         # Anzahl Buckets im Ring -> maximales Fenster 60 Minuten
+MAX_TRACKED = 20000         # Obergrenze für gleichzeitig verfolgte DX/Band-Kombinationen
+
+# (DX-Call, Band) -> Eintrag, zuletzt aktualisierte Einträge am Ende
+_activity = OrderedDict()
+
+# (chat_id, DX-Call, Band) -> Bucket, ab dem wieder gemeldet werden darf (Minspots)
+_alerts = {}
+
+def _new_entry():
+    return {
+        "counts": [0] * WINDOW_BUCKETS,         # Spots pro Ring-Slot
+        "slot_bucket": [-1] * WINDOW_BUCKETS,   # welcher Bucket gerade in diesem Slot liegt
+        "latest": {},                           # Spotter -> Bucket seines letzten Spots
+        "latest_sets": {},                      # Bucket -> Spotter, deren letzter Spot dort liegt
+        "last": -1                              # neuester Bucket dieses Eintrags
+    }
+
+def _expire(entry, newest):
+    """Entfernt Spotter, deren letzter Spot aus dem Ring herausgefallen ist."""
+    for bucket in [b for b in entry["latest_sets"] if b <= newest - WINDOW_BUCKETS]:
+        for spotter in entry["latest_sets"].pop(bucket):
+            del entry["latest"][spotter]
+
+def _spots_in_window(entry, newest, buckets):
+    return sum(
+        count for count, bucket in zip(entry["counts"], entry["slot_bucket"])
+        if bucket > newest - buckets
+    )
+
+def _window_buckets(minutes: int) -> int:
+    return max(1, min(WINDOW_BUCKETS, minutes * 60 // BUCKET_SECONDS))
+
+def _distinct_cumulative(entry, newest):
+    """Liste: Index i = Anzahl verschiedener Spotter in den letzten i+1 Buckets."""
+    result = []
+    total = 0
+    for i in range(WINDOW_BUCKETS):
+        spotters = entry["latest_sets"].get(newest - i)
+        if spotters:
+            total += len(spotters)
+        result.append(total)
+    return result
+
+def record_spot(dx_call: str, band: str, spotter: str, now: float | None = None):
+    """
+    Zählt einen Spot für (DX-Call, Band). now ist ein Unix-Zeitstempel (Standard: jetzt).
+    Gibt die Aktivität für minspots_reached zurück oder None, wenn der Spot älter als das Fenster ist.
+    """
+    now = time.time() if now is None else now
+    bucket = int(now // BUCKET_SECONDS)
+    key = (dx_call.upper(), band)
+    spotter = spotter.upper()
+
+    entry = _activity.get(key)
+    if entry is None:
+        entry = _activity[key] = _new_entry()
+        while len(_activity) > MAX_TRACKED:
+            _activity.popitem(last=False)
+    else:
+        _activity.move_to_end(key)
+
+    newest = max(entry["last"], bucket)
+    entry["last"] = newest
+    _expire(entry, newest)
+
+    if bucket <= newest - WINDOW_BUCKETS:
+        return None  # z. B. sehr alter nachgeholter Spot
+
+    slot = bucket % WINDOW_BUCKETS
+    if entry["slot_bucket"][slot] != bucket:
+        entry["slot_bucket"][slot] = bucket
+        entry["counts"][slot] = 0
+    entry["counts"][slot] += 1
+
+    prev = entry["latest"].get(spotter)
+    if prev is None or bucket > prev:
+        if prev is not None:
+            entry["latest_sets"][prev].discard(spotter)
+            if not entry["latest_sets"][prev]:
+                del entry["latest_sets"][prev]
+        entry["latest"][spotter] = bucket
+        entry["latest_sets"].setdefault(bucket, set()).add(spotter)
+
+    return {
+        "key": key,
+        "newest": newest,
+        "spotters": entry["latest"],  # nur bis zum nächsten record_spot gültig
+        "distinct": _distinct_cumulative(entry, newest)
+    }
+
+def spotters_in_window(activity, minutes: int, spotter_filter=None) -> int:
+    """Anzahl verschiedener Spotter im Fenster; mit spotter_filter nur die Spotter, für die er True liefert."""
+    buckets = _window_buckets(minutes)
+    if spotter_filter is None:
+        return activity["distinct"][buckets - 1]
+
+    lower = activity["newest"] - buckets
+    return sum(
+        1 for spotter, bucket in activity["spotters"].items()
+        if bucket > lower and spotter_filter(spotter)
+    )
+
+def minspots_reached(chat_id, activity, count: int, minutes: int, spotter_filter=None) -> bool:
+    """
+    True, wenn mindestens count verschiedene (von spotter_filter akzeptierte) Spotter im Fenster liegen
+    und für Nutzer, DX-Call und Band noch nicht gemeldet wurde. Die Meldung wird vermerkt und läuft mit
+    dem Fenster ab. Es kommt nicht darauf an, welcher Spot die Schwelle erreicht hat.
+    """
+    if activity is None:
+        return False
+
+    key = (str(chat_id), *activity["key"])
+    if _alerts.get(key, -1) > activity["newest"]:
+        return False
+    if spotters_in_window(activity, minutes, spotter_filter) < count:
+        return False
+
+    _alerts[key] = activity["newest"] + _window_buckets(minutes)
+    return True
+
+def get_hot(limit: int = 10, minutes: int = 15, now: float | None = None):
+    """Liefert die aktivsten DX-Stationen: Liste von (DX-Call, Band, Spotter, Spots), absteigend sortiert."""
+    now = time.time() if now is None else now
+    current = int(now // BUCKET_SECONDS)
+    buckets = _window_buckets(minutes)
+
+    hot = []
+    for (dx_call, band), entry in _activity.items():
+        if entry["last"] <= current - buckets:
+            continue
+        spotters = sum(
+            len(s) for b, s in entry["latest_sets"].items() if b > current - buckets
+        )
+        hot.append((dx_call, band, spotters, _spots_in_window(entry, current, buckets)))
+
+    hot.sort(key=lambda item: (item[2], item[3]), reverse=True)
+    return hot[:limit]
+
+def prune_activity(now: float | None = None):
+    """Entfernt Einträge ohne Spot im gesamten Fenster (älteste liegen vorne) und abgelaufene Minspots-Meldungen."""
+    now = time.time() if now is None else now
+    current = int(now // BUCKET_SECONDS)
+    while _activity:
+        key, entry = next(iter(_activity.items()))
+        if entry["last"] > current - WINDOW_BUCKETS:
+            break
+        del _activity[key]
+
+    for key in [k for k, until in _alerts.items() if until <= current]:
+        del _alerts[key]
+
+def export_activity():
+    """Zustand für einen Snapshot: Liste von [DX-Call, Band, neuester Bucket, [[Bucket, Spots], ...], {Spotter: Bucket}]."""
+    return [
+        [
+            dx_call, band, entry["last"],
+            [[bucket, count] for count, bucket in zip(entry["counts"], entry["slot_bucket"]) if count],
+            dict(entry["latest"])  # Kopie, da der Snapshot in einem Thread geschrieben wird
+        ]
+        for (dx_call, band), entry in _activity.items()
+    ]
+
+def import_activity(rows, now: float | None = None):
+    """Stellt den Zustand aus export_activity wieder her; bereits abgelaufene Einträge werden verworfen."""
+    now = time.time() if now is None else now
+    current = int(now // BUCKET_SECONDS)
+
+    _activity.clear()
+    for dx_call, band, last, slots, latest in rows:
+        if last <= current - WINDOW_BUCKETS:
+            continue
+
+        entry = _activity[(dx_call, band)] = _new_entry()
+        entry["last"] = last
+        for bucket, count in slots:
+            entry["slot_bucket"][bucket % WINDOW_BUCKETS] = bucket
+            entry["counts"][bucket % WINDOW_BUCKETS] = count
+        for spotter, bucket in latest.items():
+            entry["latest"][spotter] = bucket
+            entry["latest_sets"].setdefault(bucket, set()).add(spotter)
+        _expire(entry, max(last, current))
+
+def export_alerts():
+    """Minspots-Meldungen für einen Snapshot: Liste von [chat_id, DX-Call, Band, gesperrt bis Bucket]."""
+    return [[chat_id, dx_call, band, until] for (chat_id, dx_call, band), until in _alerts.items()]
+
+def import_alerts(rows, now: float | None = None):
+    """Stellt die Minspots-Meldungen aus export_alerts wieder her; abgelaufene werden verworfen."""
+    now = time.time() if now is None else now
+    current = int(now // BUCKET_SECONDS)
+
+    _alerts.clear()
+    for chat_id, dx_call, band, until in rows:
+        if until > current:
+            _alerts[(chat_id, dx_call, band)] = until
@@ -0,0 +1,206 @@
+# adif_util.py
+import json
+import os
+import re
+
+from log_util import log_error
+
+WORKED_DIR = "worked"
+
+# Reihenfolge bestimmt die Bit-Position im Index, daher nur hinten erweitern!
+BANDS = [
+    "160m", "80m", "60m", "40m", "30m", "20m", "17m",
+    "15m", "12m", "10m", "6m", "4m", "2m", "70cm"
+]
+MODE_CLASSES = ["CW", "PH", "DG"]  # Telegrafie, Sprechfunk, Digital
+
+PHONE_MODES = {
+    "SSB", "LSB", "USB", "AM", "FM", "DV", "DSTAR", "FREEDV", "C4FM", "DMR", "DIGITALVOICE"
+}
+
+# Zusätze, die beim Bestimmen des Präfixes ignoriert werden (z. B. DL1ABC/P)
+IGNORED_SUFFIXES = {"P", "M", "MM", "AM", "QRP", "A", "B", "LH"}
+
+_BAND_INDEX = {band: i for i, band in enumerate(BANDS)}
+_ALL_MODES_MASK = (1 << len(MODE_CLASSES)) - 1
+
+def call_prefix(call: str) -> str:
+    """
+    Liefert das WPX-Präfix eines Rufzeichens (bis einschließlich der letzten Ziffer vor dem Suffix).
+    Präfix-Zusätze ohne abschließende Ziffer bekommen eine 0 angehängt, ein Zusatz /Ziffer ersetzt die Ziffer.
+    Beispiele: DL1ABC -> DL1, 3D2AG -> 3D2, F/DL1ABC -> F0, 4X/DL1ABC -> 4X0, DL1ABC/3 -> DL3, DL1ABC/P -> DL1.
+    Dient als Näherung für die DXCC-Entität, da die Spots keine DXCC-Nummer enthalten. Ein Land kann
+    mehrere Präfixe haben (z. B. W1, K1, N1), der Needed-Filter arbeitet daher auf Präfix-Ebene.
+    """
+    raw = [p for p in call.upper().strip().split("/") if p]
+    area = next((p for p in raw if p.isdigit()), None)
+    parts = [p for p in raw if p not in IGNORED_SUFFIXES and not p.isdigit()]
+    if not parts:
+        return ""
+
+    # Bei Rufzeichen wie VP8/G3ABC bestimmt der kürzere Teil (der ganze Zusatz) das Präfix
+    if len(parts) > 1:
+        prefix = min(parts, key=len)
+        if not prefix[-1].isdigit():
+            prefix = f"{prefix}0"
+    else:
+        match = re.match(r"(.*\d)[A-Z]*$", parts[0])
+        prefix = match.group(1) if match else f"{parts[0][:2]}0"  # ohne Ziffer, z. B. RAEM -> RA0
+
+    # Anderes Rufzeichengebiet, z. B. DL1ABC/3 -> DL3
+    if area is not None:
+        prefix = f"{prefix.rstrip('0123456789')}{area}"
+    return prefix
+
+def mode_class(mode: str | None) -> str | None:
+    """Ordnet eine Betriebsart einer der Klassen CW, PH (Phone) oder DG (Digital) zu."""
+    if not mode:
+        return None
+
+    mode = mode.upper()
+    if mode == "CW":
+        return "CW"
+    if mode in PHONE_MODES:
+        return "PH"
+    return "DG"
+
+def slot_mask(band: str, mode: str | None) -> int:
+    """Bitmaske für Band x Betriebsart. Ohne bekannte Betriebsart: alle Klassen des Bandes."""
+    band_idx = _BAND_INDEX.get(band)
+    if band_idx is None:
+        return 0
+
+    cls = mode_class(mode)
+    if cls is None:
+        return _ALL_MODES_MASK << (band_idx * len(MODE_CLASSES))
+    return 1 << (band_idx * len(MODE_CLASSES) + MODE_CLASSES.index(cls))
+
+def is_worked(index: dict | None, prefix: str, band: str, mode: str | None) -> bool:
+    """
+    Prüft in O(1), ob der Slot (Präfix x Band x Betriebsart) bereits gearbeitet wurde.
+    prefix ist das Ergebnis von call_prefix, damit es pro Spot nur einmal berechnet wird.
+    Ist die Betriebsart unbekannt, gilt der Slot nur als gearbeitet, wenn alle Klassen auf dem Band gearbeitet sind.
+    """
+    if not index:
+        return False
+
+    mask = slot_mask(band, mode)
+    if not mask:
+        return False
+    return index.get(prefix, 0) & mask == mask
+
+def iter_adif_records(path: str, fields=None, chunk_size: int = 1 << 16):
+    """
+    Liest eine ADIF-Datei blockweise und liefert jeden QSO-Datensatz als Dictionary (Feldnamen in Großbuchstaben).
+    Mit fields (Menge von Feldnamen) werden nur diese Felder übernommen.
+    """
+    # latin-1: ein Zeichen entspricht einem Byte, passend zu den Längenangaben in ADIF
+    with open(path, mode="r", encoding="latin-1", newline="") as f:
+        buf = ""
+        pos = 0
+        eof = False
+        record = {}
+
+        while True:
+            lt = buf.find("<", pos)
+            gt = buf.find(">", lt) if lt != -1 else -1
+
+            if gt != -1:
+                name, _, spec = buf[lt + 1:gt].partition(":")
+                name = name.upper()
+
+                if name == "EOH":
+                    record = {}  # Header-Felder verwerfen
+                    pos = gt + 1
+                    continue
+
+                if name == "EOR":
+                    if record:
+                        yield record
+                    record = {}
+                    pos = gt + 1
+                    continue
+
+                try:
+                    length = int(spec.split(":")[0]) if spec else 0
+                except ValueError:
+                    length = 0
+
+                end = gt + 1 + length
+                if end <= len(buf):
+                    if fields is None or name in fields:
+                        record[name] = buf[gt + 1:end]
+                    pos = end
+                    continue
+
+            # Nicht genug Daten im Puffer: ab dem angefangenen Tag nachladen
+            if eof:
+                break
+            keep_from = lt if lt != -1 else len(buf)
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buf = buf[keep_from:] + chunk
+            pos = 0
+
+def build_worked_index(path: str, band_from_mhz=None):
+    """
+    Erstellt aus einem ADIF-Log den Index {Präfix: Bitmaske der gearbeiteten Band x Betriebsart-Slots}.
+    band_from_mhz wird genutzt, wenn ein QSO kein BAND-Feld, aber eine Frequenz hat.
+    Gibt (index, Anzahl QSOs) zurück.
+    """
+    index = {}
+    qsos = 0
+
+    for rec in iter_adif_records(path, fields={"CALL", "BAND", "FREQ", "MODE", "SUBMODE"}):
+        call = rec.get("CALL", "").strip()
+        if not call:
+            continue
+        qsos += 1
+
+        band = rec.get("BAND", "").strip().lower()
+        if not band and band_from_mhz and rec.get("FREQ"):
+            try:
+                band = band_from_mhz(float(rec["FREQ"]))
+            except ValueError:
+                band = ""
+
+        # Ohne Betriebsart würde slot_mask alle Klassen markieren, daher überspringen
+        mode = rec.get("SUBMODE") or rec.get("MODE")
+        mask = slot_mask(band, mode) if mode else 0
+        if mask:
+            prefix = call_prefix(call)
+            index[prefix] = index.get(prefix, 0) | mask
+
+    return index, qsos
+
+def get_worked_index_path(chat_id) -> str:
+    """Pfad zur gespeicherten Index-Datei eines Nutzers."""
+    return os.path.join(WORKED_DIR, f"{chat_id}.json")
+
+def save_worked_index(chat_id, index: dict):
+    """Schreibt den Index atomar über eine temporäre Datei, damit ein Abbruch keine halbe Datei hinterlässt."""
+    os.makedirs(WORKED_DIR, exist_ok=True)
+    path = get_worked_index_path(chat_id)
+    tmp = f"{path}.tmp"
+    with open(tmp, mode="w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load_worked_indexes() -> dict:
+    """Lädt alle gespeicherten Indizes: {chat_id: {Präfix: Bitmaske}}. Unlesbare Dateien werden übersprungen."""
+    indexes = {}
+    if not os.path.isdir(WORKED_DIR):
+        return indexes
+
+    for name in os.listdir(WORKED_DIR):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(WORKED_DIR, name), mode="r", encoding="utf-8") as f:
+                indexes[name[:-5]] = json.load(f)
+        except (OSError, ValueError) as e:
+            log_error(e, context = f"ADIF: Worked-Index {name} unlesbar, übersprungen.", key = f"worked_index_load|{name}")
+    return indexes
@@ -0,0 +1,57 @@
+# bench_outbox.py
+# Misst den Durchsatz des Outbox-Journals (Group Commit) bei Contest-Spotraten.
+# Aufruf: python bench_outbox.py [Nachrichten] [gleichzeitige Sendungen] [Telegram-Latenz in s]
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import outbox_util
+
+async def deliver(chat_id, text, latency):
+    """Wie im Bot: erst ins Journal, dann 'senden', dann bestätigen."""
+    entry_id = await outbox_util.append(chat_id, text, "Markdown")
+    await asyncio.sleep(latency)
+    outbox_util.ack(entry_id)
+
+async def run_group_commit(path, total, concurrency, latency):
+    await outbox_util.open_outbox(path)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await deliver(i % 50, f"📡 *DX-Cluster Treffer:* Spot {i}", latency)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    await outbox_util.close_outbox()
+    return time.perf_counter() - start
+
+def run_fsync_per_entry(path, total):
+    """Vergleich: jede Zeile einzeln mit fsync."""
+    start = time.perf_counter()
+    with open(path, mode="a", encoding="utf-8") as f:
+        for i in range(total):
+            f.write(f'{{"op": "add", "id": "{i}", "text": "Spot {i}"}}\n')
+            f.flush()
+            os.fsync(f.fileno())
+    return time.perf_counter() - start
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        elapsed = asyncio.run(run_group_commit(os.path.join(tmp, "outbox.journal"), total, concurrency, latency))
+        stats = outbox_util.stats
+        print(f"Group Commit : {total} Nachrichten in {elapsed:.2f} s = {total / elapsed:.0f}/s "
+              f"({stats['commits']} fsyncs, {stats['entries'] / max(stats['commits'], 1):.1f} Zeilen pro fsync)")
+
+        baseline_total = min(total, 1000)
+        elapsed = run_fsync_per_entry(os.path.join(tmp, "baseline.journal"), baseline_total)
+        print(f"fsync/Zeile  : {baseline_total} Zeilen in {elapsed:.2f} s = {baseline_total / elapsed:.0f}/s")
+
+if __name__ == "__main__":
+    main()
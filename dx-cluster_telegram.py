@@ -3,12 +3,25 @@ import telnetlib3
 import re
 import os
 import json
-
-from datetime import datetime
+import hashlib
+import time
+import calendar
+import random
+import socket
+from collections import OrderedDict
+
+from datetime import datetime, timedelta
 from telegram import Bot
-from telegram.ext import Application, CommandHandler
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter
+from telegram.request import HTTPXRequest
+from telegram.ext import Application, CommandHandler, MessageHandler, filters
 # ==============================================================================
-from log_util import log_dx_spot, log_message, log_error
+from log_util import log_dx_spot, log_message, log_error, flush_error_summary, log_metric
+from adif_util import build_worked_index, call_prefix, is_worked, save_worked_index, load_worked_indexes
+from activity_util import record_spot, minspots_reached, get_hot, prune_activity, WINDOW_BUCKETS, export_activity, import_activity, export_alerts, import_alerts
+from outbox_util import open_outbox, close_outbox, append as outbox_append, ack as outbox_ack
+from render_util import render_spot, message_variant, PARSE_MODE, FORMATS, LANGUAGES
+from snapshot_util import save_snapshot, load_snapshot
 # ==============================================================================
 
 # Telnet Config
@@ -16,17 +29,93 @@ HOST = 'db0erf.de'      # enter Telnet Server
 PORT = 41113            # enter Telnet Port
 TELNET_USER = ''        # enter Telnet Username
 TELNET_PW = ''          # enter Telnet PW (empty if none)
-RECONNECT_INTERVAL = 10 # Sekunden
+
+# Verbindungsüberwachung
+RECONNECT_BASE = 5          # Sekunden: erste Wartezeit nach Verbindungsabbruch
+RECONNECT_MAX = 300         # Sekunden: Obergrenze für den exponentiellen Backoff
+CONNECT_TIMEOUT = 30        # Sekunden für den Verbindungsaufbau
+KEEPALIVE_INTERVAL = 60     # Sekunden ohne Daten, bis ein Keepalive-Befehl gesendet wird
+KEEPALIVE_COMMAND = "SHOW/TIME"  # harmloser Cluster-Befehl als Lebenszeichen
+KEEPALIVE_GRACE = 30        # Sekunden: bleibt die Antwort auf den Keepalive so lange aus, gilt die Verbindung als tot
+SPOT_TIMEOUT_MIN = 150      # Sekunden: kürzester Spot-Timeout (Zeit seit dem letzten "DX de")
+SPOT_TIMEOUT_MAX = 900      # Sekunden: längster Spot-Timeout bei sehr ruhigem Cluster oder nach einem Kaltstart
+SPOT_TIMEOUT_FACTOR = 10    # Spot-Timeout = Faktor x mittlerer Abstand zwischen zwei Spots
+TCP_KEEPALIVE_IDLE = 60     # Sekunden bis zur ersten TCP-Keepalive-Probe
+TCP_KEEPALIVE_INTERVAL = 15 # Sekunden zwischen den Proben
+TCP_KEEPALIVE_COUNT = 4     # Anzahl unbeantworteter Proben bis zum Abbruch
+
+# Nachholen verpasster Spots nach einem Verbindungsabbruch (SHOW/DX)
+BACKFILL_MIN_SPOTS = 30         # so viele Spots werden mindestens abgefragt (auch bei kurzem Ausfall)
+BACKFILL_MAX_SPOTS = 500        # so viele Spots werden beim Cluster höchstens abgefragt
+BACKFILL_SPOT_MARGIN = 1.5      # Zuschlag auf die erwartete Spot-Anzahl (Spot-Rate schwankt)
+BACKFILL_MAX_WINDOW = 3600      # Sekunden: längere Ausfälle werden nur teilweise nachgeholt
+BACKFILL_RESPONSE_TIMEOUT = 30  # Sekunden: so lange werden Antwortzeilen als SHOW/DX-Ausgabe gewertet
+BACKFILL_SEND_INTERVAL = 2      # Sekunden Pause nach einem nachgereichten Spot, der Nachrichten ausgelöst hat
+SEEN_CACHE_SIZE = 5000          # Anzahl gemerkter Spots zur Duplikaterkennung
 
 # Telegram Config
 bot_token = ''          # enter API Key
-bot = Bot(token=bot_token)
+SEND_POOL_SIZE = 32     # gleichzeitige HTTP-Verbindungen (Keep-Alive) für alle Sendungen
+
+# Ein gemeinsamer Bot mit einem Verbindungspool für alle Sendungen; Long-Polling bekommt eine eigene Verbindung,
+# damit es keinen Platz im Sende-Pool blockiert. Die Application verwendet denselben Bot.
+bot = Bot(
+    token=bot_token,
+    request=HTTPXRequest(
+        connection_pool_size=SEND_POOL_SIZE,
+        pool_timeout=10.0,
+        connect_timeout=10.0,
+        read_timeout=15.0,
+        write_timeout=15.0
+    ),
+    get_updates_request=HTTPXRequest(connection_pool_size=1, read_timeout=30.0)
+)
+send_semaphore = asyncio.Semaphore(SEND_POOL_SIZE)
+ADMIN_ALERT_INTERVAL = 600  # Sekunden: gleichartige Admin-Meldungen werden so lange zusammengefasst
+HOUSEKEEPING_INTERVAL = 60  # Sekunden: Summary-Zeilen / zurückgehaltene Admin-Meldungen rausschreiben
+SNAPSHOT_INTERVAL = 60      # Sekunden zwischen zwei Zustands-Snapshots (Warmstart)
+OUTBOX_REPLAY_INTERVAL = 0.5  # Sekunden Pause zwischen erneut zugestellten Nachrichten nach einem Neustart
+OUTBOX_RETRY_BASE = 5         # Sekunden: erste Wartezeit nach einem vorübergehenden Sendefehler
+OUTBOX_RETRY_MAX = 600        # Sekunden: Obergrenze für den exponentiellen Backoff
+OUTBOX_RETRY_ATTEMPTS = 8     # danach bleibt die Nachricht offen im Journal und wird erst nach einem Neustart zugestellt
 
 # User Config File
 CONFIG_FILE = 'user_config.json'
 user_config = {}
 
-RADIUS_PREFIXES = [
+# ADIF-Upload für den "needed"-Filter
+ADIF_UPLOAD_DIR = 'upload'
+ADIF_MAX_FILE_SIZE = 20 * 1024 * 1024  # Download-Limit der Telegram Bot-API
+worked_index = {}  # chat_id -> {Präfix: Bitmaske der gearbeiteten Band x Betriebsart-Slots}
+
+# Für das Matching vorbereitete Filter der aktiven Nutzer (siehe compile_filters)
+compiled_filters = {}
+
+# Zustand der Cluster-Verbindung (wird auch in /status angezeigt)
+connection_state = {
+    "node": f"{HOST}:{PORT}",
+    "connected": False,
+    "reconnects": 0,
+    "spot_gap": None,           # gleitender Mittelwert des Spot-Abstands in Sekunden
+    "disconnected_at": None,    # time.monotonic() beim Erkennen des Abbruchs
+    "outage_start_utc": None,   # UTC-Zeitpunkt des letzten Lebenszeichens vor dem Abbruch
+    "last_detect_s": None,      # Zeit vom letzten Lebenszeichen bis zur Erkennung
+    "last_recover_s": None      # Zeit von der Erkennung bis zu wieder empfangenen Daten
+}
+
+# Bereits verarbeitete Spots (Schlüssel -> None), älteste zuerst
+seen_spots = OrderedDict()
+
+# Nachgeholte Spots, die gedrosselt an das Matching übergeben werden
+backfill_queue = asyncio.Queue()
+
+# Vorübergehend fehlgeschlagene Sendungen: je Eintrag ein Task, der seine Wartezeit selbst abwartet
+retry_tasks = set()
+
+# Entprellung der Admin-Meldungen: key -> {"last_sent", "suppressed", "text"}
+admin_alerts = {}
+
+RADIUS_PREFIXES = (
     # Deutschland
     "DA", "DB", "DC", "DD", "DE", "DF", "DG", "DH", "DI", "DJ", "DK", "DL", "DM", "DN", "DO", "DQ", "DR",  # alle deutschen Prefixe
 
@@ -62,7 +151,7 @@ RADIUS_PREFIXES = [
 
     # optional: Erweiterbar um Nachbarländer 2. Ordnung oder entfernte Partnerregionen
     # z.B. "LA" (Norwegen), "SM" (Schweden), "YO" (Rumänien) je nach Projektziel
-]
+)
 
 # ==============================================================================
 
@@ -85,10 +174,45 @@ def update_config():
         with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
             json.dump(user_config, f, indent=4, ensure_ascii=False)
         log("Konfiguration erfolgreich gespeichert.")
+        compile_filters()
     except Exception as e:
         log(f"Fehler beim Speichern der Konfiguration: {e}")
         log_error(e, context = "Fehler beim speichern der 'user_config.json' .")
         
+# Fingerabdruck der Konfiguration, um vorbereitete Filter aus einem Snapshot zu prüfen
+def config_fingerprint() -> str:
+    return hashlib.sha1(json.dumps(user_config, sort_keys=True).encode("utf-8")).hexdigest()
+
+# Filter der aktiven Nutzer einmalig für das Matching vorbereiten
+def compile_filters(users=None):
+    """
+    Baut compiled_filters neu auf: Tupel für startswith/endswith, Menge für Calls.
+    users: bereits vorbereitete Filter (Listen-Form, z. B. aus einem Snapshot) statt user_config.
+    """
+    if users is None:
+        users = {
+            chat_id: {
+                "username": data.get("username", []),
+                "prefix": data.get("prefix", []),
+                "suffix": data.get("suffix", []),
+                "call": data.get("call", []),
+                "radius": data.get("radius") == "on",
+                "needed": data.get("needed") == "on",
+                "minspots": data.get("minspots", [])
+            }
+            for chat_id, data in user_config.items()
+            if data.get("status") == "active"  # Nur aktive user berücksichtigen
+        }
+
+    compiled_filters.clear()
+    for chat_id, f in users.items():
+        compiled_filters[chat_id] = {
+            **f,
+            "prefix": tuple(f["prefix"]),
+            "suffix": tuple(f["suffix"]),
+            "call": frozenset(f["call"])
+        }
+
 def ensure_user_exists(chat_id, username=None):
     chat_id = str(chat_id)
     neu = False
@@ -100,7 +224,9 @@ def ensure_user_exists(chat_id, username=None):
             "prefix": [],
             "suffix": [],
             "call": [],
-            "radius": "off"
+            "radius": "off",
+            "needed": "off",
+            "minspots": []
         }
         update_config()
         neu = True
@@ -211,49 +337,79 @@ async def parse_dx_spot(line: str):
         log("Fehler: Zeile beginnt nicht mit 'DX de '")
         raise ValueError("Ungültiges Format: Zeile muss mit 'DX de ' beginnen.")
 
-    try:
-        rest = line[6:]  # Entferne "DX de "
-
-        # Regex: Sender, Frequenz, Ziel, Kommentar, UTC-Zeit
-        match = re.match(
-            r"(\w+):\s+([0-9.]+)\s+([A-Z0-9/]+)\s+(.*?)\s*(\d{4}Z)", rest, re.IGNORECASE
-        )
-
-        if not match:
-            log("Fehler: Regex-Match fehlgeschlagen")
-            log_error(f"Fehler: Regex-Match fehlgeschlagen", context=line)
-            raise ValueError("Zeile entspricht nicht dem erwarteten Format.")
+    rest = line[6:]  # Entferne "DX de "
 
-        sender_call, frequency_str, target_call, comment, time_utc = match.groups()
-        frequency = float(frequency_str)
-        band = get_band_from_frequency(frequency)
-        comment_clean = comment.strip()
+    # Regex: Sender, Frequenz, Ziel, Kommentar, UTC-Zeit
+    match = re.match(
+        r"(\w+):\s+([0-9.]+)\s+([A-Z0-9/]+)\s+(.*?)\s*(\d{4}Z)", rest, re.IGNORECASE
+    )
 
-        mode = detect_mode(frequency, comment_clean, band)
+    if not match:
+        # Protokolliert wird zentral in monitor_connection (aggregiert)
+        raise ValueError("Zeile entspricht nicht dem erwarteten Format.")
 
-        if band == "unknown":
-            log(f"Warnung: Frequenz {frequency} kHz konnte keinem bekannten Band zugeordnet werden.")
+    sender_call, frequency_str, target_call, comment, time_utc = match.groups()
+    result = build_dx_data(sender_call, frequency_str, target_call, comment, time_utc)
 
-        if not mode:
-            log(f"Info: Kein Modus erkannt für Frequenz {frequency} kHz und Kommentar '{comment_clean}'")
+    # log(f"Erfolgreich geparst: {result}")
+    return result
 
-        result = {
-            "sender_call": sender_call,
-            "frequency": frequency,
-            "band": band,
-            "target_call": target_call,
-            "mode": mode,
-            "comment": comment_clean,
-            "time_utc": time_utc
-        }
+# Parsing einer Antwortzeile von SHOW/DX (anderes Format als die "DX de"-Zeilen)
+async def parse_show_dx_line(line: str):
+    """
+    Erwartet z. B. "14025.0  JA1XYZ  19-Oct-2026 1530Z  CQ NA  <DL1ABC>".
+    Gibt die DX-Daten inkl. "spot_time" (datetime, UTC) zurück oder None, wenn die Zeile nicht passt.
+    Als Spotter gelten dieselben Rufzeichen wie bei parse_dx_spot (z. B. keine Skimmer wie DL1ABC-#).
+    """
+    match = re.match(
+        r"\s*([0-9.]+)\s+([A-Z0-9/]+)\s+(\d{1,2}-[A-Z]{3}-\d{4})\s+(\d{4})Z\s*(.*?)\s*<(\w+)>\s*$",
+        line, re.IGNORECASE
+    )
+    if not match:
+        return None
+
+    frequency_str, target_call, date_str, time_str, comment, sender_call = match.groups()
+    result = build_dx_data(sender_call, frequency_str, target_call, comment, f"{time_str}Z")
+    result["spot_time"] = datetime.strptime(f"{date_str} {time_str}", "%d-%b-%Y %H%M")
+    return result
+
+# Gemeinsamer Aufbau der DX-Daten für Live- und nachgeholte Spots
+def build_dx_data(sender_call, frequency_str, target_call, comment, time_utc):
+    frequency = float(frequency_str)
+    band = get_band_from_frequency(frequency)
+    comment_clean = comment.strip()
+
+    mode = detect_mode(frequency, comment_clean, band)
+
+    if band == "unknown":
+        log(f"Warnung: Frequenz {frequency} kHz konnte keinem bekannten Band zugeordnet werden.")
+
+    if not mode:
+        log(f"Info: Kein Modus erkannt für Frequenz {frequency} kHz und Kommentar '{comment_clean}'")
+
+    return {
+        "sender_call": sender_call,
+        "frequency": frequency,
+        "band": band,
+        "target_call": target_call,
+        "mode": mode,
+        "comment": comment_clean,
+        "time_utc": time_utc
+    }
 
-        # log(f"Erfolgreich geparst: {result}")
-        return result
+# Merkt sich einen Spot; False, wenn er schon einmal verarbeitet wurde
+def mark_spot_seen(dx_data) -> bool:
+    key = (
+        f"{dx_data['target_call'].upper()}|{dx_data['sender_call'].upper()}|"
+        f"{round(dx_data['frequency'])}|{dx_data['time_utc']}"
+    )
+    if key in seen_spots:
+        return False
 
-    except Exception as e:
-        log(f"Fehler beim Parsen der Zeile: {e}")
-        log_error(e, context = "Fehler beim Parsen")
-        raise
+    seen_spots[key] = None
+    if len(seen_spots) > SEEN_CACHE_SIZE:
+        seen_spots.popitem(last=False)
+    return True
     
 # Befehls Init. wird oft verwendet
 async def befehls_init(update, context):
@@ -331,7 +487,14 @@ async def status(update, context):
     suffix = user_config[chat_id].get("suffix", [])
     call = user_config[chat_id].get("call", [])
     radius = user_config[chat_id].get("radius", [])
+    needed = user_config[chat_id].get("needed", "off")
+    worked_slots = len(worked_index.get(chat_id, {}))
+    minspots = user_config[chat_id].get("minspots", [])
+    minspots_text = f"{minspots[0]} Spotter in {minspots[1]} Min." if minspots else "aus"
     user_status_value = user_config[chat_id].get("status", "inactive")
+    verbindung = "verbunden" if connection_state["connected"] else "getrennt"
+    detect_s = connection_state["last_detect_s"]
+    recover_s = connection_state["last_recover_s"]
     
     await update.message.reply_text(
         f"📡 *Dein aktueller Status:*\n"
@@ -339,8 +502,13 @@ async def status(update, context):
         f"- Prefix-Filter     : `{', '.join(prefix) or 'Keine'}`\n"
         f"- Suffix-Filter     : `{', '.join(suffix) or 'Keine'}`\n"
         f"- Call-Filter        : `{', '.join(call) or 'Keine'}`\n"
-        f"- Radius-Filter     : `{(radius)}`\n\n"
-        f"🌐 Verbunden mit: `{HOST}`\n\n"
+        f"- Radius-Filter     : `{(radius)}`\n"
+        f"- Needed-Filter     : `{needed}` ({worked_slots} gearbeitete Präfixe)\n"
+        f"- Minspots-Filter   : `{minspots_text}`\n\n"
+        f"🌐 Verbunden mit: `{HOST}` ({verbindung})\n"
+        f"- Wiederverbindungen: `{connection_state['reconnects']}`\n"
+        f"- Letzter Abbruch erkannt nach: `{'-' if detect_s is None else f'{detect_s:.0f} s'}`\n"
+        f"- Letzte Wiederherstellung: `{'-' if recover_s is None else f'{recover_s:.0f} s'}`\n\n"
         f"📝 Nutze /hilfe um alle verfügbaren Befehle zu sehen",
         parse_mode="Markdown"
     )
@@ -355,12 +523,15 @@ async def filter_command(update, context):
     
     if len(context.args) < 1:
         await update.message.reply_text(
-            "ℹ️ *Verwendung:* `/filter <prefix|suffix|call|radius> [Wert1 Wert2 ...]`\n\n"
+            "ℹ️ *Verwendung:* `/filter <prefix|suffix|call|radius|needed|minspots|format|lang> [Wert1 Wert2 ...]`\n\n"
             "📌 Beispiele:\n"
             "• `/filter prefix 3D2 ZS`\n"
             "• `/filter suffix DARC /QRP`\n"
             "• `/filter call T30TTT`\n"
             "• `/filter radius on`\n"
+            "• `/filter needed on` (nur noch nicht gearbeitete Präfix/Band/Mode-Slots, ADIF-Log hochladen)\n"
+            "• `/filter minspots 5 10` (erst melden, wenn 5 Spotter in 10 Minuten)\n"
+            "• `/filter format compact` / `/filter lang en` (Darstellung der Treffer)\n"
             "• `/filter <prefix|suffix|call>` (leert den Filter)\n\n"
             "Du kannst Filter mit *Leerzeichen* oder *Komma* trennen.",
             parse_mode="Markdown"
@@ -370,8 +541,8 @@ async def filter_command(update, context):
     filter_type = context.args[0].lower()
     raw_values  = context.args[1:]  # kann leer sein für leeren Filter
 
-    if filter_type not in ["prefix", "suffix", "call", "radius"]:
-        await update.message.reply_text("❌ Unbekannter Filtertyp. Benutze prefix, suffix oder call.")
+    if filter_type not in ["prefix", "suffix", "call", "radius", "needed", "minspots", "format", "lang"]:
+        await update.message.reply_text("❌ Unbekannter Filtertyp. Benutze prefix, suffix, call, radius, needed, minspots, format oder lang.")
         return
      
     # RADIUS separat behandeln
@@ -383,7 +554,60 @@ async def filter_command(update, context):
         update_config()
         await update.message.reply_text(f"✅ Radius-Filter wurde auf `{raw_values[0].lower()}` gesetzt.", parse_mode="Markdown")
         return
+
+    # NEEDED separat behandeln
+    if filter_type == "needed":
+        if not raw_values or raw_values[0].lower() not in ["on", "off"]:
+            await update.message.reply_text("ℹ️ Needed-Filter muss `on` oder `off` sein. Beispiel: `/filter needed on`", parse_mode="Markdown")
+            return
+        user_config[chat_id]["needed"] = raw_values[0].lower()
+        update_config()
+        hinweis = ""
+        if raw_values[0].lower() == "on" and chat_id not in worked_index:
+            hinweis = "\n⚠️ Noch kein Log vorhanden – schicke dem Bot dein ADIF-Log (.adi) als Datei."
+        await update.message.reply_text(f"✅ Needed-Filter wurde auf `{raw_values[0].lower()}` gesetzt.{hinweis}", parse_mode="Markdown")
+        return
     
+    # FORMAT / LANG separat behandeln (Darstellung der Treffer-Nachrichten)
+    if filter_type in ["format", "lang"]:
+        choices = FORMATS if filter_type == "format" else LANGUAGES
+        if not raw_values or raw_values[0].lower() not in choices:
+            await update.message.reply_text(
+                f"ℹ️ {filter_type} muss einer dieser Werte sein: `{'|'.join(choices)}`. Beispiel: `/filter {filter_type} {choices[-1]}`",
+                parse_mode="Markdown"
+            )
+            return
+        user_config[chat_id][filter_type] = raw_values[0].lower()
+        update_config()
+        await update.message.reply_text(f"✅ {filter_type} wurde auf `{raw_values[0].lower()}` gesetzt.", parse_mode="Markdown")
+        return
+
+    # MINSPOTS separat behandeln: [Anzahl Spotter, Minuten], leer = aus
+    if filter_type == "minspots":
+        if not raw_values:
+            user_config[chat_id]["minspots"] = []
+            update_config()
+            await update.message.reply_text("✅ Minspots-Filter wurde deaktiviert.")
+            return
+        try:
+            count = int(raw_values[0])
+            minutes = int(raw_values[1]) if len(raw_values) > 1 else 5
+        except ValueError:
+            count = minutes = 0
+        if count < 1 or not 1 <= minutes <= WINDOW_BUCKETS:
+            await update.message.reply_text(
+                f"ℹ️ Verwendung: `/filter minspots <Anzahl> <Minuten>` (Minuten 1-{WINDOW_BUCKETS}). Beispiel: `/filter minspots 5 10`",
+                parse_mode="Markdown"
+            )
+            return
+        user_config[chat_id]["minspots"] = [count, minutes]
+        update_config()
+        await update.message.reply_text(
+            f"✅ Meldung erst ab `{count}` verschiedenen Spottern in `{minutes}` Minuten.",
+            parse_mode="Markdown"
+        )
+        return
+
     # Initialisiere den Filter-Array, falls nicht vorhanden
     if f"{filter_type}" not in user_config[chat_id]:
         user_config[chat_id][f"{filter_type}"] = []
@@ -429,10 +653,89 @@ async def hilfe(update, context):
         "/filter suffix <Filter1,Filter2,...> - Setzt Suffix-Filter (leer = löschen)\n"
         "/filter call <Call1,Call2,...> - Setzt Filter für komplette Rufzeichen (leer = löschen)\n"
         "/filter radius <on|off> - der Spotter soll aus DL oder Nachbarland sein.\n"
+        "/filter needed <on|off> - nur Band/Mode-Slots eines Präfixes (z. B. DL1, W6) melden, die laut ADIF-Log noch nicht gearbeitet sind. Das ist \"needed prefix\", nicht DXCC: W1 und K1 zählen getrennt.\n"
+        "/filter minspots <Anzahl> <Minuten> - erst melden, wenn so viele Spotter im Zeitfenster (leer = aus)\n"
+        "/filter format <full|compact> - ausführliche oder kompakte Treffer-Nachrichten\n"
+        "/filter lang <de|en> - Sprache der Treffer-Nachrichten\n"
+        "/hot [Minuten] - zeigt die aktuell meistgespotteten DX-Stationen\n"
+        "ADIF-Log (.adi) als Datei senden - aktualisiert die Liste der gearbeiteten Slots.\n"
         "/hilfe - Zeigt diese Hilfenachricht"
     )
     await update.message.reply_text(help_text, parse_mode="Markdown")
     
+# /hot Befehl - Zeigt die aktuell meistgespotteten DX-Stationen
+async def hot(update, context):
+    
+    # Initialisiere Befehl, prüfe User und Berechtigungen
+    chat_id, username, allowed = await befehls_init(update, context)
+    # Falls User nicht freigeschaltet oder kein gültiges Update (z.B. EditMessage), abbrechen
+    if not allowed:
+        return
+
+    minutes = 15
+    if context.args and context.args[0].isdigit():
+        minutes = max(1, min(WINDOW_BUCKETS, int(context.args[0])))
+
+    hot_list = get_hot(limit=10, minutes=minutes)
+    if not hot_list:
+        await update.message.reply_text(f"🔥 In den letzten {minutes} Minuten keine Spots.")
+        return
+
+    lines = [f"🔥 *Meistgespottet (letzte {minutes} Min.):*"]
+    for dx_call, band, spotters, spots in hot_list:
+        lines.append(f"• `{dx_call}` {band} – {spotters} Spotter / {spots} Spots")
+    await update.message.reply_text("\n".join(lines), parse_mode="Markdown")
+
+# ADIF-Log empfangen und daraus den Worked-Index des Nutzers erstellen
+async def adif_upload(update, context):
+    
+    # Initialisiere Befehl, prüfe User und Berechtigungen
+    chat_id, username, allowed = await befehls_init(update, context)
+    # Falls User nicht freigeschaltet oder kein gültiges Update (z.B. EditMessage), abbrechen
+    if not allowed:
+        return
+
+    document = update.message.document
+    file_name = (document.file_name or "").lower()
+    if not file_name.endswith((".adi", ".adif")):
+        await update.message.reply_text("❌ Bitte ein ADIF-Log mit der Endung .adi oder .adif senden.")
+        return
+
+    if document.file_size and document.file_size > ADIF_MAX_FILE_SIZE:
+        await update.message.reply_text("❌ Die Datei ist zu groß (max. 20 MB). Bitte das Log aufteilen.")
+        return
+
+    os.makedirs(ADIF_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(ADIF_UPLOAD_DIR, f"{chat_id}.adi")
+
+    try:
+        tg_file = await document.get_file()
+        await tg_file.download_to_drive(path)
+
+        # Parsen im Thread, damit das Telnet-Monitoring nicht blockiert wird
+        index, qsos = await asyncio.to_thread(
+            build_worked_index, path, lambda mhz: get_band_from_frequency(mhz * 1000)
+        )
+        save_worked_index(chat_id, index)
+        worked_index[chat_id] = index
+
+    except Exception as e:
+        log(f"Fehler beim Verarbeiten des ADIF-Logs von {username}: {e}")
+        log_error(e, context = "ADIF-Upload: Fehler beim Einlesen.")
+        await update.message.reply_text("❌ Das ADIF-Log konnte nicht verarbeitet werden.")
+        return
+
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+    log(f"ADIF-Log von {username} eingelesen: {qsos} QSOs, {len(index)} Präfixe.")
+    await update.message.reply_text(
+        f"✅ ADIF-Log eingelesen: `{qsos}` QSOs, `{len(index)}` gearbeitete Präfixe.\n"
+        f"Mit `/filter needed on` erhältst du nur noch Treffer für neue Präfix/Band/Mode-Slots (Präfix, nicht DXCC-Land).",
+        parse_mode="Markdown"
+    )
+
 # Befehl zur Freigabe neuer Benutzer mit optionaler Rollenvergabe
 async def approve(update, context):
     
@@ -537,10 +840,12 @@ async def send_telegram_message(text, target="active"):
     try:
         # 👤 Direkt an eine bestimmte Chat-ID senden
         if isinstance(target, (str, int)) and str(target).isdigit():
-            await bot.send_message(chat_id=str(target), text=text)
+            await send_limited(chat_id=str(target), text=text)
             return
 
         # 🔁 Durch alle Nutzer in der Konfigurationsdatei iterieren
+        recipients = []
+        sends = []
         for chat_id, data in user_config.items():
             # Aktuellen Status und Rolle des Nutzers auslesen
             status = data.get("status", "new")  # fallback: 'new'
@@ -548,67 +853,432 @@ async def send_telegram_message(text, target="active"):
 
             # 🎯 Ziel: Alle freigeschalteten (aktiven) Nutzer
             if target == "active" and status == "active":
-                await bot.send_message(chat_id=chat_id, text=text)
+                recipients.append(chat_id)
+                sends.append(send_limited(chat_id=chat_id, text=text))
 
             # 🎯 Ziel: Alle Nutzer mit Admin-Rechten
             elif target == "admin" and role == "admin":
-                await bot.send_message(chat_id=chat_id, text=text)
+                recipients.append(chat_id)
+                sends.append(send_limited(chat_id=chat_id, text=text))
+
+        # Parallel über den gemeinsamen Verbindungspool senden; ein Fehler bricht die übrigen Sendungen nicht ab
+        results = await asyncio.gather(*sends, return_exceptions=True)
+        for chat_id, result in zip(recipients, results):
+            if isinstance(result, Exception):
+                log(f"Fehler beim Telegram-Versand an {chat_id}: {result}")
+                log_error(result, context = "Send Telegram Message: Fehler beim Telegram-Versand.", key = f"send_message|{type(result).__name__}")
 
     except Exception as e:
         # 🛑 Fehler beim Senden protokollieren
         log(f"Fehler beim Telegram-Versand an '{target}': {e}")
         log_error(e, context = "Send Telegram Message: Fehler beim Telegram-Versand.")
 
+# Wartezeit bis zum nächsten Verbindungsversuch
+def reconnect_delay(attempt: int) -> float:
+    """Exponentieller Backoff mit Jitter: zwischen 50 % und 100 % von min(RECONNECT_MAX, BASE * 2^attempt)."""
+    ceiling = min(RECONNECT_MAX, RECONNECT_BASE * 2 ** attempt)
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+# Spot-Timeout passend zur beobachteten Spot-Rate
+def get_spot_timeout() -> float:
+    """
+    Liefert in Sekunden, wie lange nach dem letzten "DX de" ohne neuen Spot gewartet wird, bevor
+    die Sitzung neu aufgebaut wird (Verbindung steht, liefert aber keine Spots mehr). Bei ruhigem
+    Cluster (große Spot-Abstände) wird länger gewartet. Eine tote Verbindung erkennt schon der Keepalive.
+    """
+    spot_gap = connection_state["spot_gap"]
+    if spot_gap is None:
+        return SPOT_TIMEOUT_MAX
+    return max(SPOT_TIMEOUT_MIN, min(SPOT_TIMEOUT_MAX, SPOT_TIMEOUT_FACTOR * spot_gap))
+
+# Anzahl der per SHOW/DX abzufragenden Spots
+def get_backfill_count(outage_s: float) -> int:
+    """Schätzt aus Ausfalldauer und mittlerem Spot-Abstand, wie viele Spots verpasst wurden (mit Zuschlag und Obergrenze)."""
+    spot_gap = connection_state["spot_gap"]
+    if not spot_gap:
+        return BACKFILL_MAX_SPOTS  # Spot-Rate unbekannt (z. B. Kaltstart)
+    expected = int(outage_s / spot_gap * BACKFILL_SPOT_MARGIN) + 1
+    return max(BACKFILL_MIN_SPOTS, min(BACKFILL_MAX_SPOTS, expected))
+
+# TCP-Keepalive auf dem Socket der Telnet-Verbindung aktivieren
+def enable_tcp_keepalive(writer):
+    sock = writer.get_extra_info("socket")
+    if sock is None:
+        return
+
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    # Die feineren Optionen gibt es nicht auf allen Plattformen
+    for option, value in (
+        ("TCP_KEEPIDLE", TCP_KEEPALIVE_IDLE),
+        ("TCP_KEEPINTVL", TCP_KEEPALIVE_INTERVAL),
+        ("TCP_KEEPCNT", TCP_KEEPALIVE_COUNT)
+    ):
+        if hasattr(socket, option):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+# Admin-Meldung mit Entprellung senden
+async def send_admin_alert(text, key):
+    """
+    Sendet eine Meldung an alle Admins, aber pro key höchstens einmal
+    in ADMIN_ALERT_INTERVAL Sekunden. Zwischenzeitlich unterdrückte Meldungen
+    werden gezählt und mit der nächsten Meldung (oder per flush_admin_alerts) gemeldet.
+    """
+    now = time.monotonic()
+    entry = admin_alerts.get(key)
+
+    if entry and now - entry["last_sent"] < ADMIN_ALERT_INTERVAL:
+        entry["suppressed"] += 1
+        entry["text"] = text
+        return
+
+    suppressed = entry["suppressed"] if entry else 0
+    admin_alerts[key] = {"last_sent": now, "suppressed": 0, "text": text}
+
+    if suppressed:
+        text += f"\n(+{suppressed} gleichartige Meldungen unterdrückt)"
+    await send_telegram_message(text, target="admin")
+
+async def flush_admin_alerts():
+    """Meldet zurückgehaltene Admin-Meldungen, deren Sperrzeit abgelaufen ist."""
+    now = time.monotonic()
+    for key, entry in list(admin_alerts.items()):
+        if now - entry["last_sent"] < ADMIN_ALERT_INTERVAL:
+            continue
+        if entry["suppressed"]:
+            await send_telegram_message(
+                f"{entry['text']}\n({entry['suppressed']} gleichartige Meldungen in den letzten "
+                f"{ADMIN_ALERT_INTERVAL // 60} Minuten)",
+                target="admin"
+            )
+        del admin_alerts[key]
+
+# Regelmäßige Aufräumarbeiten (Fehler-Summaries, entprellte Admin-Meldungen)
+async def housekeeping():
+    while True:
+        await asyncio.sleep(HOUSEKEEPING_INTERVAL)
+        try:
+            flush_error_summary()
+            prune_activity()
+            await flush_admin_alerts()
+        except Exception as e:
+            log(f"Fehler im Housekeeping: {e}")
+            log_error(e, context = "Housekeeping: Fehler beim Aufräumen.")
+
+# Alle Sendungen laufen hierüber, damit nie mehr Anfragen offen sind als der Pool Verbindungen hat
+async def send_limited(**kwargs):
+    async with send_semaphore:
+        return await bot.send_message(**kwargs)
+
+# Laufzeit-Zustand für den Warmstart zusammenstellen
+def collect_state():
+    """
+    Sammelt Spot-Historie, Dedup-Cache, vorbereitete Filter und Verbindungsstatus (JSON-fähig).
+    Die Worked-Indizes liegen bereits als Dateien in WORKED_DIR und werden nicht mitgesichert.
+    """
+    node_state = {
+        "reconnects": connection_state["reconnects"],
+        "spot_gap": connection_state["spot_gap"],
+        "last_detect_s": connection_state["last_detect_s"],
+        "last_recover_s": connection_state["last_recover_s"],
+        # Beginn eines laufenden Ausfalls; bei bestehender Verbindung gilt "jetzt" (für das Backfill nach dem Neustart)
+        "outage_start_utc": (
+            connection_state["outage_start_utc"]
+            or (datetime.utcnow() if connection_state["connected"] else None)
+        )
+    }
+    if node_state["outage_start_utc"] is not None:
+        node_state["outage_start_utc"] = node_state["outage_start_utc"].isoformat()
+
+    return {
+        "activity": export_activity(),
+        "alerts": export_alerts(),
+        "seen_spots": list(seen_spots),
+        "filters": {
+            "fingerprint": config_fingerprint(),
+            "users": {
+                chat_id: {**f, "prefix": list(f["prefix"]), "suffix": list(f["suffix"]), "call": list(f["call"])}
+                for chat_id, f in compiled_filters.items()
+            }
+        },
+        "nodes": {connection_state["node"]: node_state}
+    }
+
+# Zustand aus dem letzten Snapshot wiederherstellen (beim Start, vor dem Event-Loop)
+def restore_state():
+    start_time = time.perf_counter()
+    try:
+        state, saved_at = load_snapshot()
+    except Exception as e:
+        log(f"Snapshot konnte nicht gelesen werden: {e}")
+        log_error(e, context = "Snapshot: Fehler beim Laden.")
+        state, saved_at = None, None
+
+    if state is not None:
+        try:
+            apply_state(state)
+            log(
+                f"Snapshot vom {datetime.fromtimestamp(saved_at):%H:%M:%S} geladen "
+                f"in {(time.perf_counter() - start_time) * 1000:.1f} ms."
+            )
+            return
+        except Exception as e:
+            # Unerwarteter Inhalt: lieber kalt starten als mit halbem Zustand
+            log(f"Snapshot unbrauchbar, Kaltstart: {e}")
+            log_error(e, context = "Snapshot: Fehler beim Übernehmen.")
+            seen_spots.clear()
+            import_activity([])
+            import_alerts([])
+
+    compile_filters()
+    log("Kein verwendbarer Snapshot gefunden – Kaltstart.")
+
+def apply_state(state):
+    """Übernimmt den Inhalt eines Snapshots in die laufenden Strukturen."""
+    import_activity(state["activity"])
+    import_alerts(state["alerts"])
+    seen_spots.update((key, None) for key in state["seen_spots"])
+
+    # Vorbereitete Filter nur übernehmen, wenn sich die Konfiguration nicht geändert hat
+    if state["filters"]["fingerprint"] == config_fingerprint():
+        compile_filters(state["filters"]["users"])
+    else:
+        compile_filters()
+
+    node_state = state["nodes"].get(connection_state["node"])
+    if node_state:
+        for key in ("reconnects", "spot_gap", "last_detect_s", "last_recover_s"):
+            connection_state[key] = node_state[key]
+        if node_state["outage_start_utc"]:
+            connection_state["outage_start_utc"] = datetime.fromisoformat(node_state["outage_start_utc"])
+
+# Aktuellen Zustand sichern (JSON-Aufbereitung im Event-Loop, Schreiben im Thread)
+async def write_snapshot():
+    try:
+        state = collect_state()
+        await asyncio.to_thread(save_snapshot, state)
+    except Exception as e:
+        log(f"Fehler beim Schreiben des Snapshots: {e}")
+        log_error(e, context = "Snapshot: Fehler beim Schreiben.", key = f"snapshot|{type(e).__name__}")
+
+# Regelmäßige Snapshots für den Warmstart
+async def snapshot_worker():
+    while True:
+        await asyncio.sleep(SNAPSHOT_INTERVAL)
+        await write_snapshot()
+
+# Treffer-Nachricht über das Outbox-Journal zustellen (mindestens einmal)
+async def deliver(chat_id, text, parse_mode=None, entry_id=None):
+    """
+    Legt die Nachricht zuerst im Journal ab (Group Commit), sendet sie dann und
+    bestätigt sie erst nach erfolgreichem Versand. Nicht bestätigte Nachrichten
+    werden nach einem Neustart erneut zugestellt.
+    """
+    if entry_id is None:
+        try:
+            entry_id = await outbox_append(chat_id, text, parse_mode)
+        except Exception as e:
+            # Journal nicht beschreibbar (z. B. Platte voll): trotzdem senden, nur ohne Wiederholung nach Neustart
+            log(f"Outbox-Journal nicht beschreibbar, sende ohne Journal: {e}")
+            log_error(e, context = "Outbox: Journal nicht beschreibbar, Versand ohne Journal.", key = f"outbox_append|{type(e).__name__}")
+            await send_limited(chat_id=chat_id, text=text, parse_mode=parse_mode)
+            return
+
+    try:
+        await send_limited(chat_id=chat_id, text=text, parse_mode=parse_mode)
+    except (BadRequest, Forbidden):
+        # Dauerhafte Fehler (z. B. Bot blockiert): nicht erneut zustellen
+        outbox_ack(entry_id)
+        raise
+    except (NetworkError, RetryAfter) as e:
+        # Vorübergehende Fehler (Timeout, Netz, Flood-Limit): mit Backoff erneut versuchen
+        schedule_retry(chat_id, text, parse_mode, entry_id, 0, e)
+        raise
+
+    outbox_ack(entry_id)
+
+# Vorübergehend fehlgeschlagene Sendung später erneut versuchen
+def schedule_retry(chat_id, text, parse_mode, entry_id, attempt, error):
+    """
+    Exponentieller Backoff mit Jitter wie beim Reconnect, bei RetryAfter mindestens die
+    von Telegram verlangte Wartezeit. Nach OUTBOX_RETRY_ATTEMPTS Versuchen bleibt der
+    Eintrag offen im Journal (wird beim Verdichten behalten und nach einem Neustart zugestellt).
+    """
+    if attempt >= OUTBOX_RETRY_ATTEMPTS:
+        log(f"Gebe Zustellung an {chat_id} nach {attempt} Versuchen vorerst auf: {error}")
+        log_error(error, context = "Outbox: Zustellung nach mehreren Versuchen aufgegeben.", key = f"outbox_retry_give_up|{type(error).__name__}")
+        return
+
+    ceiling = min(OUTBOX_RETRY_MAX, OUTBOX_RETRY_BASE * 2 ** attempt)
+    delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+    if isinstance(error, RetryAfter):
+        retry_after = error.retry_after
+        if isinstance(retry_after, timedelta):
+            retry_after = retry_after.total_seconds()
+        delay = max(delay, retry_after)
+
+    # Eigener Task pro Eintrag, damit eine lange Wartezeit keine früher fälligen Einträge aufhält
+    task = asyncio.create_task(retry_send(chat_id, text, parse_mode, entry_id, attempt + 1, delay))
+    retry_tasks.add(task)
+    task.add_done_callback(retry_tasks.discard)
+
+# Einen Eintrag nach Ablauf der Wartezeit erneut senden
+async def retry_send(chat_id, text, parse_mode, entry_id, attempt, delay):
+    await asyncio.sleep(delay)
+
+    try:
+        await send_limited(chat_id=chat_id, text=text, parse_mode=parse_mode)
+    except (BadRequest, Forbidden) as e:
+        outbox_ack(entry_id)
+        log(f"Fehler beim erneuten Senden an {chat_id}: {e}")
+        log_error(e, context = "Outbox: Fehler beim erneuten Senden.", key = f"outbox_retry|{type(e).__name__}")
+    except (NetworkError, RetryAfter) as e:
+        schedule_retry(chat_id, text, parse_mode, entry_id, attempt, e)
+    except Exception as e:
+        log(f"Fehler beim erneuten Senden an {chat_id}: {e}")
+        log_error(e, context = "Outbox: Fehler beim erneuten Senden.", key = f"outbox_retry|{type(e).__name__}")
+    else:
+        outbox_ack(entry_id)
+
+# Nach dem Start offene Nachrichten aus dem Journal erneut zustellen
+async def replay_outbox(pending):
+    if pending:
+        log(f"Stelle {len(pending)} offene Nachricht(en) aus dem Outbox-Journal erneut zu ...")
+
+    for entry in sorted(pending, key=lambda e: e["ts"]):
+        try:
+            await deliver(entry["chat_id"], entry["text"], entry["parse_mode"], entry_id=entry["id"])
+        except Exception as e:
+            log(f"Fehler beim erneuten Zustellen an {entry['chat_id']}: {e}")
+            log_error(e, context = "Outbox: Fehler beim erneuten Zustellen.", key = f"outbox_replay|{type(e).__name__}")
+        await asyncio.sleep(OUTBOX_REPLAY_INTERVAL)
+
 # Wenn die Filter einen Treffer finden...
 async def handle_match(chat_id, username, dx_data):
     """Aktion bei Treffer mit geparsten DX-Daten."""
     try:
         # Daten aus dem Dictionary extrahieren
-        sender = dx_data.get("sender_call", "N/A")
         target = dx_data.get("target_call", "N/A")
         freq   = dx_data.get("frequency", 0.0)
         band   = dx_data.get("band", "unknown")
         mode   = dx_data.get("mode", "n/a")
-        time   = dx_data.get("time_utc", "")
-        comment = dx_data.get("comment", "")
 
         # Protokollieren
         log(f"Treffer für {username} gefunden: {target} auf {freq} kHz ({band}, {mode})")
 
-        # Nachrichtentext formatieren
-        message = (
-            f"📡 *DX-Cluster Treffer:*\n"
-            f"• *Call:* `{target}`\n"
-            f"• *Frequenz:* `{freq:.1f} kHz`\n"
-            f"• *Band:* `{band}`\n"
-            f"• *Betriebsart:* `{mode}`\n"
-            f"• *Kommentar:* `{comment}`\n"
-            f"• *Von:* `{sender}` um `{time}`"
-        )
-
-        # Senden über Telegram Bot
-        status = user_config.get(chat_id, {}).get("status")
-        if status == "active":
-            await bot.send_message(
-                chat_id=chat_id,
-                text=message,
-                parse_mode="Markdown"
-            )
+        # Senden über Telegram Bot (über das Outbox-Journal)
+        user_data = user_config.get(chat_id, {})
+        if user_data.get("status") == "active":
+            # Nachrichtentext wird pro Spot und Variante (Format, Sprache) nur einmal gerendert
+            message = render_spot(dx_data, *message_variant(user_data))
+            await deliver(chat_id, message, parse_mode=PARSE_MODE)
 
     except Exception as e:
         log(f"Fehler beim Senden der Telegram-Nachricht: {e}")
         log_error(e, context = "Handle Match: Fehler beim Telegram-Versand.")
 
+# Spotter aus DL oder einem Nachbarland (Radius-Filter)
+def is_radius_spotter(sender: str) -> bool:
+    return sender.startswith(RADIUS_PREFIXES)
+
+# Spot gegen die Filter aller Nutzer prüfen (Live- und nachgeholte Spots)
+async def process_spot(dx_data):
+    """Prüft einen geparsten Spot gegen alle aktiven Nutzer und löst ggf. handle_match aus. Gibt die Anzahl der Treffer zurück."""
+    # Doppelte Spots (z. B. Live-Spot und SHOW/DX-Antwort) nur einmal verarbeiten
+    if not mark_spot_seen(dx_data):
+        return 0
+
+    target = dx_data["target_call"]
+    sender = dx_data["sender_call"]
+    frequency = dx_data["frequency"]
+    band = dx_data["band"]
+    mode = dx_data["mode"]
+    comment = dx_data["comment"]
+
+    # 🔥 Aktivität zählen (nachgeholte Spots mit ihrer eigentlichen Spot-Zeit)
+    spot_time = dx_data.get("spot_time")
+    activity = record_spot(
+        target, band, sender,
+        now = calendar.timegm(spot_time.timetuple()) if spot_time else None
+    )
+    
+    # Radius hängt nur vom Spotter ab, daher einmal pro Spot prüfen
+    radius_match = is_radius_spotter(sender)
+
+    # Präfix für den Needed-Filter ebenfalls nur einmal pro Spot bestimmen
+    target_prefix = call_prefix(target)
+
+    # Für alle aktiven user prüfen, Treffer gemeinsam versenden (ein Journal-Commit für alle)
+    matches = []
+    for chat_id, data in compiled_filters.items():
+        user = data["username"]
+        radius_active = data["radius"]
+        needed_active = data["needed"]
+        minspots = data["minspots"]
+
+        # 🔍 Führe Matching auf dem Zielrufzeichen durch
+        prefix_match = target.startswith(data["prefix"])
+        suffix_match = target.endswith(data["suffix"])
+        call_match   = target in data["call"]
+
+        # Logik:
+        # - Wenn Radius aus ist: ganz normal
+        # - Wenn Radius an ist: dann muss ein Radius-Match UND ein Benutzerfilter-Match vorliegen
+        if radius_active:
+            matched = radius_match and (prefix_match or suffix_match or call_match)
+        else:
+            matched = prefix_match or suffix_match or call_match
+
+        # - Wenn Needed an ist: bereits gearbeitete Slots (Präfix x Band x Mode) unterdrücken
+        if matched and needed_active and is_worked(worked_index.get(chat_id), target_prefix, band, mode):
+            matched = False
+
+        # - Wenn Minspots gesetzt ist: einmal pro Fenster melden, sobald genug Spotter gemeldet haben.
+        #   Bei Radius zählen nur Spotter aus dem Radius.
+        if matched and minspots:
+            matched = minspots_reached(
+                chat_id, activity, minspots[0], minspots[1],
+                spotter_filter = is_radius_spotter if radius_active else None
+            )
+
+        if matched:
+            matches.append(handle_match(chat_id, user, dx_data))
+
+    if matches:
+        await asyncio.gather(*matches)
+    return len(matches)
+
+# Nachgeholte Spots gedrosselt abarbeiten, damit kein Nachrichtenschwall entsteht
+async def backfill_worker():
+    while True:
+        dx_data = await backfill_queue.get()
+        try:
+            matches = await process_spot(dx_data)
+        except Exception as e:
+            log(f"Fehler beim Verarbeiten eines nachgeholten Spots: {e}")
+            log_error(e, context = "Backfill: Fehler beim Verarbeiten.")
+            continue
+
+        # Nur drosseln, wenn tatsächlich Nachrichten verschickt wurden
+        if matches:
+            await asyncio.sleep(BACKFILL_SEND_INTERVAL)
+
 # Telnet Verbindung aufbauen und halten. Erhaltene Zeilen Parser übergeben und Treffer in Filtern suchen.
 async def monitor_connection():
     """Verbindung aufbauen und Daten überwachen."""
+    attempt = 0  # Anzahl Fehlversuche seit der letzten funktionierenden Verbindung
+
     while True:
+        writer = None
+        last_rx = time.monotonic()  # letztes Lebenszeichen der Gegenstelle
+        last_spot_at = last_rx      # letzter "DX de" (bzw. Verbindungsaufbau)
+
         try:
             log(f"Verbinde mit {HOST}:{PORT} ...")
-            await send_telegram_message(f"Versuche Verbindung zu {HOST}:{PORT}", target = "admin")
-            reader, writer = await telnetlib3.open_connection(HOST, PORT)
+            await send_admin_alert(f"Versuche Verbindung zu {HOST}:{PORT}", key = "telnet_connect")
+            reader, writer = await asyncio.wait_for(telnetlib3.open_connection(HOST, PORT), timeout = CONNECT_TIMEOUT)
+            enable_tcp_keepalive(writer)
             log("Verbindung hergestellt.")
-            await send_telegram_message("Telnet-Verbindung erfolgreich hergestellt.", target = "admin")
+            await send_admin_alert("Telnet-Verbindung erfolgreich hergestellt.", key = "telnet_connected")
 
             # Optional: Anmeldung o. Ä.
             writer.write(f"{TELNET_USER}\n")
@@ -639,70 +1309,150 @@ async def monitor_connection():
             # Filter anzeigen
             writer.write("SHOW/FILTER\n")
 
+            # 🕳️ Nach einem Abbruch die verpassten Spots beim Cluster nachfragen
+            backfill_since = None
+            backfill_until = 0.0
+            backfill_count = 0
+            backfill_limit = 0
+            if connection_state["outage_start_utc"] is not None:
+                backfill_since = max(
+                    connection_state["outage_start_utc"],
+                    datetime.utcnow() - timedelta(seconds=BACKFILL_MAX_WINDOW)
+                ).replace(second=0, microsecond=0)  # SHOW/DX liefert nur Minuten
+                # outage_start_utc bleibt gesetzt, bis das Antwortfenster vorbei ist (siehe unten),
+                # damit ein erneuter Abbruch vorher die Lücke nicht verliert
+                backfill_until = time.monotonic() + BACKFILL_RESPONSE_TIMEOUT
+                backfill_limit = get_backfill_count((datetime.utcnow() - backfill_since).total_seconds())
+                writer.write(f"SHOW/DX {backfill_limit}\n")
+                log(f"Fordere bis zu {backfill_limit} verpasste Spots seit {backfill_since:%H:%M} UTC an ...")
+
+            last_rx = time.monotonic()
+            last_spot_at = last_rx
+            last_keepalive = last_rx
+            keepalive_pending = False   # Keepalive gesendet, aber noch keine Zeile empfangen
+            last_spot = None
+            receiving = False
+
             # Endlosschleife zum Lesen der Daten
             while True:
-                line = await reader.readline()
+                now = time.monotonic()
+                spot_timeout = get_spot_timeout()
+
+                # ⏱️ Halboffene Verbindung erkennen: auf den Keepalive kommt keine Antwort
+                if keepalive_pending and now - last_keepalive >= KEEPALIVE_GRACE:
+                    raise TimeoutError(f"Keine Antwort auf {KEEPALIVE_COMMAND} nach {now - last_keepalive:.0f} Sekunden")
+
+                # ⏱️ Sitzung steht, liefert aber keine Spots mehr
+                if now - last_spot_at >= spot_timeout:
+                    raise TimeoutError(f"Keine Spots seit {now - last_spot_at:.0f} Sekunden (Spot-Timeout {spot_timeout:.0f} s)")
+
+                # 💓 Bei Funkstille ein Lebenszeichen anfordern
+                if not keepalive_pending and now - last_rx >= KEEPALIVE_INTERVAL:
+                    writer.write(f"{KEEPALIVE_COMMAND}\n")
+                    last_keepalive = now
+                    keepalive_pending = True
+
+                # Bis zur nächsten fälligen Prüfung lesen
+                next_check = min(
+                    last_keepalive + KEEPALIVE_GRACE if keepalive_pending else last_rx + KEEPALIVE_INTERVAL,
+                    last_spot_at + spot_timeout
+                )
+                try:
+                    line = await asyncio.wait_for(reader.readline(), timeout = max(0.1, next_check - now))
+                except asyncio.TimeoutError:
+                    continue  # Keepalive / Timeouts oben prüfen
+
                 if not line:
                     raise ConnectionError("Verbindung unterbrochen")
+
+                last_rx = time.monotonic()
+                keepalive_pending = False
+
+                # Erste Daten nach (Wieder-)Verbindung: Verbindung gilt als stabil
+                if not receiving:
+                    receiving = True
+                    attempt = 0
+                    connection_state["connected"] = True
+                    if connection_state["disconnected_at"] is not None:
+                        recover_s = last_rx - connection_state["disconnected_at"]
+                        connection_state["last_recover_s"] = recover_s
+                        connection_state["disconnected_at"] = None
+                        log_metric("telnet_time_to_recover_s", f"{recover_s:.1f}")
                     
                 # log(line.strip())  # Optional: Alle Telnet Zeilen anzeigen
                 
                 line = line.strip()
+
+                # Antwortfenster vorbei: Ausfall gilt als nachgeholt
+                if backfill_since is not None and last_rx >= backfill_until:
+                    connection_state["outage_start_utc"] = None
+
+                # Antwortzeilen auf SHOW/DX: nur neue Spots aus dem Ausfallzeitraum übernehmen
+                if backfill_since is not None and last_rx < backfill_until and not line.startswith("DX de "):
+                    try:
+                        dx_data = await parse_show_dx_line(line)
+                    except Exception as e:
+                        log_error(e, context = f"Backfill-Parse-Fehler: {line}", key = f"backfill_parse|{type(e).__name__}")
+                        continue
+                    if dx_data and dx_data["spot_time"] >= backfill_since and backfill_count < backfill_limit:
+                        dx_data["late"] = True
+                        backfill_queue.put_nowait(dx_data)
+                        backfill_count += 1
+                    continue
+
                 if not line.startswith("DX de "):
                     continue  # Nicht relevant
+
+                # Mittleren Spot-Abstand nachführen (Grundlage für den Spot-Timeout)
+                if last_spot is not None:
+                    gap = last_rx - last_spot
+                    spot_gap = connection_state["spot_gap"]
+                    connection_state["spot_gap"] = gap if spot_gap is None else 0.9 * spot_gap + 0.1 * gap
+                last_spot = last_rx
+                last_spot_at = last_rx
                 
                 try:
                     dx_data = await parse_dx_spot(line)  # 🎯 parse die Zeile
 
                 except Exception as e:
-                    log(f"Parse-Fehler: {e} | Zeile: {line}")
-                    log_error(e, context = f"Parse-Fehler: {line}")
+                    # Aggregiert protokollieren; Konsole nur, wenn auch vollständig geloggt wurde
+                    if log_error(e, context = f"Parse-Fehler: {line}", key = f"parse|{type(e).__name__}"):
+                        log(f"Parse-Fehler: {e} | Zeile: {line}")
                     continue  # Fehlerhafte Zeile überspringen
                 
-                target = dx_data["target_call"]
-                sender = dx_data["sender_call"]
-                frequency = dx_data["frequency"]
-                band = dx_data["band"]
-                mode = dx_data["mode"]
-                comment = dx_data["comment"]
-                
-                # Für alle user in user_config prüfen
-                for chat_id, data in user_config.items():
-                    if data.get('status') != 'active':
-                        continue  # Nur aktive user berücksichtigen
-
-                    prefix = data.get('prefix', [])
-                    suffix = data.get('suffix', [])
-                    call = data.get('call', [])
-                    user = data.get('username', [])
-                    radius_active = data.get("radius") == "on"
-
-                    # 🔍 Führe Matching auf dem Zielrufzeichen durch
-                    prefix_match = any(target.startswith(p) for p in prefix)
-                    suffix_match = any(target.endswith(s) for s in suffix)
-                    call_match   = target in call
-                    radius_match = any(sender.startswith(r) for r in RADIUS_PREFIXES)  
-
-                    # Logik:
-                    # - Wenn Radius aus ist: ganz normal
-                    # - Wenn Radius an ist: dann muss ein Radius-Match UND ein Benutzerfilter-Match vorliegen
-                    if radius_active:
-                        if radius_match and (prefix_match or suffix_match or call_match):
-                            await handle_match(chat_id, user, dx_data)
-                    else:
-                        if prefix_match or suffix_match or call_match:
-                            await handle_match(chat_id, user, dx_data)
+                await process_spot(dx_data)
 
         except Exception as e:
-            await send_telegram_message(f"❌ Telnet-Verbindung verloren: {e}", target = "admin")
+            detected_at = time.monotonic()
+            if writer is not None:
+                writer.close()
+
+            # Nur beim ersten Fehlschlag einer Ausfallserie die Erkennungszeit messen
+            if connection_state["disconnected_at"] is None:
+                detect_s = detected_at - last_rx
+                connection_state["disconnected_at"] = detected_at
+                connection_state["last_detect_s"] = detect_s
+                log_metric("telnet_time_to_detect_s", f"{detect_s:.1f}")
+            # Frühesten Ausfallbeginn behalten, solange die Lücke noch nicht nachgeholt wurde.
+            # Ab dem letzten Spot zählen: bei ausbleibenden Spots kamen evtl. noch Keepalive-Antworten.
+            if connection_state["outage_start_utc"] is None:
+                connection_state["outage_start_utc"] = datetime.utcnow() - timedelta(seconds=detected_at - min(last_rx, last_spot_at))
+            connection_state["connected"] = False
+            connection_state["reconnects"] += 1
+
+            delay = reconnect_delay(attempt)
+            attempt += 1
+
+            await send_admin_alert(f"❌ Telnet-Verbindung verloren: {e}", key = f"telnet_lost|{type(e).__name__}")
             log (f"Fehler: {e}")
-            log (f"Neuer Verbindungsversuch in {RECONNECT_INTERVAL} Sekunden ...")
-            log_error(e, context = "Telnet-Verbindung verloren!}")
-            await asyncio.sleep(RECONNECT_INTERVAL)
+            log (f"Neuer Verbindungsversuch in {delay:.0f} Sekunden ...")
+            log_error(e, context = "Telnet-Verbindung verloren!")
+            await asyncio.sleep(delay)
 
 # Telegram-Bot starten und mit Befehlen reagieren
 async def start_bot_and_monitor():
-    application = Application.builder().token(bot_token).build()
+    # Denselben Bot (und damit denselben Verbindungspool) wie für alle anderen Sendungen verwenden
+    application = Application.builder().bot(bot).build()
 
     # Befehlshandler hinzufügen
     application.add_handler(CommandHandler("start", start))
@@ -711,6 +1461,17 @@ async def start_bot_and_monitor():
     application.add_handler(CommandHandler("filter", filter_command))
     application.add_handler(CommandHandler("hilfe", hilfe))
     application.add_handler(CommandHandler("approve", approve))
+    application.add_handler(CommandHandler("hot", hot))
+    application.add_handler(MessageHandler(filters.Document.ALL, adif_upload))
+
+    # Outbox-Journal öffnen (vor dem Telnet-Monitoring, damit Treffer gespeichert werden können)
+    pending = await open_outbox()
+
+    # Starte Telnet-Monitoring und Housekeeping sofort, parallel zur Initialisierung des Bots
+    telnet_task = asyncio.create_task(monitor_connection())
+    housekeeping_task = asyncio.create_task(housekeeping())
+    backfill_task = asyncio.create_task(backfill_worker())
+    snapshot_task = asyncio.create_task(snapshot_worker())
 
     # Initialisiere und starte den Bot manuell
     await application.initialize()
@@ -718,15 +1479,30 @@ async def start_bot_and_monitor():
     await application.updater.start_polling()
     await send_telegram_message("🔄 DX-Cluster Monitor gestartet", target = "admin")
 
-    # Starte Telnet-Monitoring parallel
-    telnet_task = asyncio.create_task(monitor_connection())
+    # Offene Nachrichten erst zustellen, wenn der Bot bereit ist
+    replay_task = asyncio.create_task(replay_outbox(pending))
 
     # Warte bis der Bot gestoppt wird (z. B. via Signal)
     await application.updater.wait_until_closed()
     
 
     # Danach beende sauber alles
-    await telnet_task
+    housekeeping_task.cancel()
+    backfill_task.cancel()
+    replay_task.cancel()
+    # Offene Wiederholungen bleiben im Journal und werden nach dem Neustart zugestellt
+    for task in list(retry_tasks):
+        task.cancel()
+    snapshot_task.cancel()
+    telnet_task.cancel()
+    try:
+        await telnet_task  # Endlosschleife, läuft nur durch cancel() aus
+    except asyncio.CancelledError:
+        pass
+
+    # Letzter Snapshot und offene Journal-Zeilen erst nach dem Ende der Telnet-Verbindung
+    await write_snapshot()
+    await close_outbox()
     await application.stop()
     await application.shutdown()
 
@@ -734,6 +1510,9 @@ async def start_bot_and_monitor():
 if __name__ == '__main__':
     # JSON in Variable laden
     load_config()
+    worked_index.update(load_worked_indexes())
+    # Warmstart: Spot-Historie, Caches, Filter und Verbindungsstatus aus dem letzten Snapshot
+    restore_state()
     # Starte den Bot und das Telnet-Monitoring innerhalb einer Event-Schleife
     try:
         loop = asyncio.get_event_loop()
@@ -742,3 +1521,7 @@ if __name__ == '__main__':
     except KeyboardInterrupt as e:
         log("Beendet durch Benutzer.")
         log_error(e, context = "Script beendet!")
+        flush_error_summary(force=True)
+        # Zustand und noch nicht geschriebene Journal-Zeilen sichern
+        loop.run_until_complete(write_snapshot())
+        loop.run_until_complete(close_outbox())
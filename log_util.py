@@ -1,6 +1,7 @@
 # log_util.py
 import csv
 import os
+import time
 from datetime import datetime
 
 LOG_DIR = "log"
@@ -17,8 +18,23 @@ DX_HEADERS = [
 ]
 
 MESSAGE_HEADERS = ["timestamp", "level", "message"]
+METRIC_HEADERS = ["timestamp", "metric", "value"]
 ERROR_HEADERS = ["timestamp", "exception_type", "exception_msg", "details"]
 
+# Fehler-Aggregation: pro Fehlersignatur werden die ersten ERROR_FULL_LIMIT
+# Vorkommen vollständig geschrieben, danach nur jedes ERROR_SAMPLE_EVERY-te.
+# Nach Ablauf von ERROR_SUMMARY_INTERVAL Sekunden folgt eine Summary-Zeile.
+ERROR_FULL_LIMIT = 5
+ERROR_SAMPLE_EVERY = 100
+ERROR_SUMMARY_INTERVAL = 300    # Sekunden
+
+# Größenbasierte Rotation der error_log.csv
+ERROR_LOG_MAX_BYTES = 1_000_000
+ERROR_LOG_BACKUPS = 3
+
+# Signatur -> {"window_start", "count", "suppressed", "exc_type", "exc_msg", "context"}
+_error_stats = {}
+
 def get_timestamp():
     return datetime.utcnow().isoformat(timespec="seconds")
 
@@ -33,10 +49,29 @@ def get_message_logfile_path():
     """Pfad zur tagesbezogenen messages-Logdatei."""
     return os.path.join(LOG_DIR, f"messages_{get_date_str()}.csv")
 
+def get_metric_logfile_path():
+    """Pfad zur tagesbezogenen Metrik-Logdatei."""
+    return os.path.join(LOG_DIR, f"metrics_{get_date_str()}.csv")
+
 def get_error_logfile_path():
     """Pfad zur zentralen Fehlerdatei."""
     return os.path.join(LOG_DIR, "error_log.csv")
 
+def rotate_file_if_needed(filepath, max_bytes, backups):
+    """Rotiert Datei nach dem Schema datei.1.csv ... datei.<backups>.csv, wenn sie zu groß wird."""
+    if not os.path.exists(filepath) or os.path.getsize(filepath) < max_bytes:
+        return
+
+    base, ext = os.path.splitext(filepath)
+    oldest = f"{base}.{backups}{ext}"
+    if os.path.exists(oldest):
+        os.remove(oldest)
+    for i in range(backups - 1, 0, -1):
+        src = f"{base}.{i}{ext}"
+        if os.path.exists(src):
+            os.replace(src, f"{base}.{i + 1}{ext}")
+    os.replace(filepath, f"{base}.1{ext}")
+
 def init_file_if_missing(filepath, headers):
     """Legt Datei mit Header an, falls sie noch nicht existiert."""
     if not os.path.exists(filepath):
@@ -73,14 +108,62 @@ def log_message(message: str, level: str = "INFO"):
         ])
     # print(f"[{level.upper()}] {message}")
 
-def log_error(exc_or_msg, context: str = ""):
+def log_metric(metric: str, value):
+    """Schreibt einen Messwert (z. B. Zeit bis zur Erkennung eines Verbindungsabbruchs) in die Tagesdatei."""
+    path = get_metric_logfile_path()
+    init_file_if_missing(path, METRIC_HEADERS)
+    with open(path, mode="a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            get_timestamp(),
+            metric,
+            value
+        ])
+
+def write_error_row(exc_type, exc_msg, details):
+    """Schreibt genau eine Zeile in error_log.csv (inkl. Rotation)."""
+    path = get_error_logfile_path()
+    rotate_file_if_needed(path, ERROR_LOG_MAX_BYTES, ERROR_LOG_BACKUPS)
+    init_file_if_missing(path, ERROR_HEADERS)
+
+    with open(path, mode="a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([
+            get_timestamp(),
+            exc_type,
+            exc_msg,
+            details
+        ])
+
+def flush_error_summary(force: bool = False):
+    """
+    Schreibt Summary-Zeilen für alle Signaturen, deren Zeitfenster abgelaufen ist
+    (bzw. für alle, wenn force=True) und setzt deren Zähler zurück.
+    """
+    now = time.monotonic()
+    for key, stats in list(_error_stats.items()):
+        if not force and now - stats["window_start"] < ERROR_SUMMARY_INTERVAL:
+            continue
+
+        if stats["suppressed"]:
+            write_error_row(
+                "Summary",
+                f"{stats['count']}x {stats['exc_type']}: {stats['exc_msg']} "
+                f"({stats['suppressed']} nicht einzeln protokolliert)",
+                stats["context"]
+            )
+        del _error_stats[key]
+
+def log_error(exc_or_msg, context: str = "", key: str | None = None) -> bool:
     """
     Protokolliert einen Fehler in error_log.csv.
     Unterstützt entweder ein Exception-Objekt oder einen reinen Fehlertext.
-    """
-    path = get_error_logfile_path()
-    init_file_if_missing(path, ERROR_HEADERS)
 
+    Gleichartige Fehler (gleiche Signatur aus Typ und Kontext bzw. expliziter key)
+    werden aggregiert: die ersten ERROR_FULL_LIMIT Vorkommen pro Zeitfenster
+    vollständig, danach nur Stichproben und eine Summary-Zeile mit Anzahl.
+    Gibt True zurück, wenn der Fehler vollständig geschrieben wurde.
+    """
     if isinstance(exc_or_msg, Exception):
         exc_type = type(exc_or_msg).__name__
         exc_msg = str(exc_or_msg)
@@ -88,12 +171,28 @@ def log_error(exc_or_msg, context: str = ""):
         exc_type = "ManualError"
         exc_msg = str(exc_or_msg)
 
-    with open(path, mode="a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            get_timestamp(),
-            exc_type,
-            exc_msg,
-            context
-        ])
+    # abgelaufene Fenster zuerst zusammenfassen
+    flush_error_summary()
+
+    signature = key or f"{exc_type}|{context}"
+    stats = _error_stats.setdefault(signature, {
+        "window_start": time.monotonic(),
+        "count": 0,
+        "suppressed": 0,
+        "exc_type": exc_type,
+        "exc_msg": exc_msg,
+        "context": context
+    })
+    stats["count"] += 1
+
+    if stats["count"] <= ERROR_FULL_LIMIT:
+        details = context
+    elif stats["count"] % ERROR_SAMPLE_EVERY == 0:
+        details = f"[Stichprobe #{stats['count']}] {context}"
+    else:
+        stats["suppressed"] += 1
+        return False
+
+    write_error_row(exc_type, exc_msg, details)
     # print(f"[ERROR] {exc_type}: {exc_msg}")
+    return True
@@ -0,0 +1,189 @@
+# outbox_util.py
+import asyncio
+import json
+import os
+import time
+import uuid
+
+OUTBOX_FILE = "outbox.journal"
+OUTBOX_MAX_AGE = 1800           # Sekunden: ältere offene Nachrichten werden beim Start verworfen
+OUTBOX_COMPACT_BYTES = 1_000_000  # Journal ab dieser Größe auf die offenen Einträge verdichten
+
+# Zähler für Auswertung / Benchmark
+stats = {"commits": 0, "entries": 0}
+
+_journal = None         # geöffnete Journal-Datei (append, ungepuffert, damit nach einem Fehler nichts nachgeschrieben wird)
+_queue = []             # noch nicht geschriebene Zeilen: (Zeile, Future oder None)
+_wakeup = None          # asyncio.Event für den Schreib-Task
+_writer_task = None
+_torn = False           # letzter Schreibversuch hat eventuell eine halbe Zeile hinterlassen
+_unacked = {}           # id -> Eintrag, der (gleich) im Journal steht, aber noch nicht bestätigt ist
+_path = OUTBOX_FILE
+_compacted_size = 0     # Größe des Journals nach der letzten Verdichtung
+
+def _read_pending(path, max_age):
+    """Liest das Journal und liefert alle nicht bestätigten Einträge, die jünger als max_age sind."""
+    pending = {}
+    if not os.path.exists(path):
+        return []
+
+    with open(path, mode="r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # z. B. abgebrochener letzter Schreibvorgang
+            if entry.get("op") == "add":
+                pending[entry["id"]] = entry
+            elif entry.get("op") == "ack":
+                pending.pop(entry["id"], None)
+
+    cutoff = time.time() - max_age
+    return [entry for entry in pending.values() if entry["ts"] >= cutoff]
+
+def _rewrite(path, entries):
+    """Schreibt das Journal neu (nur die übergebenen Einträge) und ersetzt es atomar."""
+    tmp = f"{path}.tmp"
+    with open(tmp, mode="w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _open_journal(path):
+    return open(path, mode="ab", buffering=0)
+
+def _write_batch(lines):
+    """
+    Group Commit: alle Zeilen schreiben, dann genau ein fsync.
+    Schlägt das fehl, wird auf den letzten vollständigen Stand gekürzt, damit keine halbe Zeile
+    mit der nächsten verschmilzt (beide wären sonst beim Einlesen unbrauchbar).
+    """
+    global _torn
+
+    # Kürzen war beim letzten Mal nicht möglich: die halbe Zeile mit einem Zeilenumbruch abschließen
+    text = "".join(lines)
+    data = memoryview((f"\n{text}" if _torn else text).encode("utf-8"))
+    start = _journal.tell()
+    try:
+        while data:
+            data = data[_journal.write(data):]
+        os.fsync(_journal.fileno())
+        _torn = False
+    except OSError:
+        try:
+            _journal.truncate(start)
+        except OSError:
+            _torn = True
+        raise
+
+def _compact(entries):
+    """Ersetzt das Journal durch eines, das nur noch die offenen Einträge enthält. Gibt die neue Größe zurück."""
+    global _journal, _torn
+
+    _journal.close()
+    _rewrite(_path, entries)
+    _journal = _open_journal(_path)
+    _torn = False
+    return _journal.tell()
+
+async def _writer():
+    global _compacted_size
+
+    while True:
+        await _wakeup.wait()
+        _wakeup.clear()
+
+        batch = _queue[:]
+        del _queue[:]
+        if not batch:
+            continue
+
+        try:
+            await asyncio.to_thread(_write_batch, [line for line, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            continue
+
+        stats["commits"] += 1
+        stats["entries"] += len(batch)
+
+        # Journal auf die offenen Einträge verdichten, damit es nicht endlos wächst.
+        # Nur bei leerer Warteschlange, sonst stünden deren Einträge danach doppelt im Journal.
+        # Die doppelte Größe der letzten Verdichtung verhindert ständiges Neuschreiben bei vielen offenen Einträgen.
+        if not _queue and _journal.tell() >= max(OUTBOX_COMPACT_BYTES, 2 * _compacted_size):
+            _compacted_size = await asyncio.to_thread(_compact, list(_unacked.values()))
+
+        for _, future in batch:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+async def open_outbox(path: str = OUTBOX_FILE, max_age: float = OUTBOX_MAX_AGE):
+    """
+    Öffnet das Journal und startet den Schreib-Task.
+    Gibt die offenen (noch nicht bestätigten) Einträge zurück, die erneut zugestellt werden sollen.
+    """
+    global _journal, _wakeup, _writer_task, _path, _compacted_size
+
+    pending = await asyncio.to_thread(_read_pending, path, max_age)
+    await asyncio.to_thread(_rewrite, path, pending)
+
+    _path = path
+    _journal = _open_journal(path)
+    _compacted_size = _journal.tell()
+    _wakeup = asyncio.Event()
+    _writer_task = asyncio.create_task(_writer())
+    _unacked.clear()
+    _unacked.update({entry["id"]: entry for entry in pending})
+    return pending
+
+async def append(chat_id, text: str, parse_mode: str | None = None) -> str:
+    """Legt eine Nachricht im Journal ab und wartet, bis sie dauerhaft gespeichert ist. Gibt die ID zurück."""
+    entry = {
+        "op": "add",
+        "id": uuid.uuid4().hex,
+        "ts": time.time(),
+        "chat_id": str(chat_id),
+        "text": text,
+        "parse_mode": parse_mode
+    }
+    # Schon vor dem Commit als offen führen, damit er beim Verdichten nicht verloren geht
+    _unacked[entry["id"]] = entry
+    future = asyncio.get_running_loop().create_future()
+    _queue.append((json.dumps(entry, ensure_ascii=False) + "\n", future))
+    _wakeup.set()
+
+    try:
+        await future
+    except Exception:
+        _unacked.pop(entry["id"], None)
+        raise
+    return entry["id"]
+
+def ack(entry_id: str):
+    """Bestätigt die Zustellung. Wird ohne eigenes fsync mit dem nächsten Commit geschrieben."""
+    if _unacked.pop(entry_id, None) is None:
+        return
+    _queue.append((json.dumps({"op": "ack", "id": entry_id}) + "\n", None))
+    _wakeup.set()
+
+async def close_outbox():
+    """Schreibt noch ausstehende Zeilen und schließt das Journal."""
+    global _journal, _writer_task
+
+    if _journal is None:
+        return
+
+    # Auch bei leerer Warteschlange warten, bis eine laufende Verdichtung fertig ist
+    future = asyncio.get_running_loop().create_future()
+    _queue.append(("", future))
+    _wakeup.set()
+    await future
+
+    _writer_task.cancel()
+    _journal.close()
+    _journal = None
+    _writer_task = None
@@ -0,0 +1,95 @@
+# render_util.py
+import re
+
+PARSE_MODE = "MarkdownV2"
+
+FORMATS = ["full", "compact"]
+LANGUAGES = ["de", "en"]
+DEFAULT_FORMAT = "full"
+DEFAULT_LANGUAGE = "de"
+
+LABELS = {
+    "de": {
+        "title": "DX-Cluster Treffer",
+        "title_late": "DX-Cluster Treffer (nachgereicht)",
+        "late": "nachgereicht",
+        "call": "Call",
+        "frequency": "Frequenz",
+        "band": "Band",
+        "mode": "Betriebsart",
+        "comment": "Kommentar",
+        "by": "Von",
+        "at": "um"
+    },
+    "en": {
+        "title": "DX cluster match",
+        "title_late": "DX cluster match (late)",
+        "late": "late",
+        "call": "Call",
+        "frequency": "Frequency",
+        "band": "Band",
+        "mode": "Mode",
+        "comment": "Comment",
+        "by": "By",
+        "at": "at"
+    }
+}
+
+_MD_SPECIAL = re.compile(r"([_*\[\]()~`>#+\-=|{}.!\\])")
+
+def escape_md(text) -> str:
+    """Escaping für MarkdownV2 außerhalb von Code-Abschnitten."""
+    return _MD_SPECIAL.sub(r"\\\1", str(text))
+
+def escape_code(text) -> str:
+    """Escaping für MarkdownV2 innerhalb von `Code`-Abschnitten."""
+    return str(text).replace("\\", "\\\\").replace("`", "\\`")
+
+def message_variant(user_data: dict):
+    """Ordnet die Nutzereinstellungen einer der wenigen Varianten (Format, Sprache) zu."""
+    fmt = user_data.get("format", DEFAULT_FORMAT)
+    lang = user_data.get("lang", DEFAULT_LANGUAGE)
+    return (
+        fmt if fmt in FORMATS else DEFAULT_FORMAT,
+        lang if lang in LANGUAGES else DEFAULT_LANGUAGE
+    )
+
+def _render(dx_data, fmt, lang):
+    labels = LABELS[lang]
+    title = labels["title_late"] if dx_data.get("late") else labels["title"]
+    target = escape_code(dx_data.get("target_call", "N/A"))
+    sender = escape_code(dx_data.get("sender_call", "N/A"))
+    freq = escape_code(f"{dx_data.get('frequency', 0.0):.1f} kHz")
+    band = escape_code(dx_data.get("band", "unknown"))
+    mode = escape_code(dx_data.get("mode") or "-")
+    time_utc = escape_code(dx_data.get("time_utc") or "-")
+    comment = escape_code(dx_data.get("comment") or "-")  # leere Code-Abschnitte mag Telegram nicht
+
+    if fmt == "compact":
+        # Ohne Überschrift: nachgereichte Spots am Ende der ersten Zeile kennzeichnen
+        late = f" ⏳ _{escape_md(labels['late'])}_" if dx_data.get("late") else ""
+        return (
+            f"📡 `{target}` `{freq}` `{band}` `{mode}`{late}\n"
+            f"{escape_md(labels['by'])} `{sender}` {escape_md(labels['at'])} `{time_utc}`"
+        )
+
+    return (
+        f"📡 *{escape_md(title)}:*\n"
+        f"• *{escape_md(labels['call'])}:* `{target}`\n"
+        f"• *{escape_md(labels['frequency'])}:* `{freq}`\n"
+        f"• *{escape_md(labels['band'])}:* `{band}`\n"
+        f"• *{escape_md(labels['mode'])}:* `{mode}`\n"
+        f"• *{escape_md(labels['comment'])}:* `{comment}`\n"
+        f"• *{escape_md(labels['by'])}:* `{sender}` {escape_md(labels['at'])} `{time_utc}`"
+    )
+
+def render_spot(dx_data: dict, fmt: str = DEFAULT_FORMAT, lang: str = DEFAULT_LANGUAGE) -> str:
+    """
+    Liefert den fertigen MarkdownV2-Text für einen Spot. Jede Variante wird pro Spot
+    nur einmal gerendert und im Spot selbst (dx_data["_payloads"]) zwischengespeichert.
+    """
+    payloads = dx_data.setdefault("_payloads", {})
+    key = (fmt, lang)
+    if key not in payloads:
+        payloads[key] = _render(dx_data, fmt, lang)
+    return payloads[key]
@@ -0,0 +1,53 @@
+# snapshot_util.py
+import json
+import os
+import struct
+import time
+import zlib
+
+SNAPSHOT_FILE = "state.snapshot"
+SNAPSHOT_MAGIC = b"DXCS"
+SNAPSHOT_VERSION = 3            # bei jeder Änderung am Inhalt erhöhen, alte Snapshots werden dann ignoriert
+SNAPSHOT_MAX_AGE = 24 * 3600    # Sekunden: ältere Snapshots werden nicht mehr geladen
+
+# Kopf: Magic (4 Byte), Version (2 Byte), Zeitpunkt (8 Byte), CRC32 der Nutzdaten (4 Byte)
+_HEADER = struct.Struct(">4sHdI")
+
+def save_snapshot(state: dict, path: str = SNAPSHOT_FILE):
+    """Schreibt den Zustand komprimiert in eine Binärdatei (atomar über eine temporäre Datei)."""
+    payload = zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"), 6)
+    header = _HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, time.time(), zlib.crc32(payload))
+
+    tmp = f"{path}.tmp"
+    with open(tmp, mode="wb") as f:
+        f.write(header)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def load_snapshot(path: str = SNAPSHOT_FILE, max_age: float = SNAPSHOT_MAX_AGE):
+    """
+    Lädt einen Snapshot. Gibt (Zustand, Zeitpunkt) zurück oder (None, None), wenn die Datei fehlt,
+    beschädigt, zu alt oder in einem anderen Format (Version) geschrieben ist.
+    """
+    if not os.path.exists(path):
+        return None, None
+
+    with open(path, mode="rb") as f:
+        data = f.read()
+
+    if len(data) < _HEADER.size:
+        return None, None
+
+    magic, version, saved_at, crc = _HEADER.unpack_from(data)
+    payload = data[_HEADER.size:]
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or zlib.crc32(payload) != crc:
+        return None, None
+    if time.time() - saved_at > max_age:
+        return None, None
+
+    try:
+        return json.loads(zlib.decompress(payload).decode("utf-8")), saved_at
+    except (zlib.error, ValueError):
+        return None, None